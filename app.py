@@ -1,13 +1,14 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
 import numpy as np
-import time
 import os
 import io
-import zipfile
-from src.model import ChargingStationModel
-from src.vis_utils import render_station_visual
-from src.analytics import ScientificPlotter
+import time
+import itertools
+import multiprocessing
+from src.vis_utils import render_demo_player
+from src.utils import create_results_zip, load_results_file
 from src.config import TRUCK_PROFILES
 
 st.set_page_config(layout="wide", page_title="SIRQ Research Platform", page_icon="⚡")
@@ -38,7 +39,126 @@ st.markdown("""
 # --- STATE MANAGEMENT ---
 if 'monte_carlo_df' not in st.session_state: st.session_state['monte_carlo_df'] = None
 if 'agent_level_df' not in st.session_state: st.session_state['agent_level_df'] = None
-if 'current_page' not in st.session_state: st.session_state['current_page'] = "Concept & Demo"
+if 'data_key' not in st.session_state: st.session_state['data_key'] = None
+
+# --- CACHED BATCH RUNNER ---
+@st.cache_data(show_spinner=False, max_entries=8)
+def run_monte_carlo(n_runs, loads, pc, ps, pe, master_seed):
+    """
+    Runs the full Monte Carlo batch; identical parameters are served from the cache.
+    `loads` must be a tuple so the arguments are hashable. master_seed is always
+    concrete (the caller resolves "random"), so the cache is keyed on the real seed.
+    """
+    from src.batch import _init_worker, _run_single, worker_count, micro_frame, RESULT_DTYPE
+    
+    micro_dump = []
+    prog = st.progress(0); stat = st.empty()
+    
+    base = {"prob_critical": pc, "prob_standard": ps, "prob_economy": pe}
+    
+    # One task per replication; seeds are drawn here (in one call) so every worker gets its own stream.
+    # Drawn without replacement: with hundreds of replications, independent 6-digit draws would
+    # likely repeat a seed somewhere (birthday bound), i.e. duplicate a replication.
+    # FIFO and SIRQ run i of a load share one seed (common random numbers): the pair starts from
+    # the same arrival stream, so strategy differences are not drowned in traffic noise.
+    seeds = (np.random.default_rng(master_seed).choice(900000, size=len(loads) * n_runs, replace=False) + 100000).reshape(len(loads), n_runs)
+    grid = itertools.product(range(len(loads)), range(2), range(n_runs))
+    tasks = [(k, i, int(seeds[li, i]), ("FIFO", "SIRQ")[si], loads[li]) for k, (li, si, i) in enumerate(grid)]
+    total = len(tasks)
+    
+    # Heaviest loads are dispatched first (longest-job-first), so the batch doesn't end
+    # with one worker grinding through the 2.0x runs while the others sit idle
+    tasks.sort(key=lambda t: t[4], reverse=True)
+    
+    # Rows land at their task index, so the frame keeps (load, strategy, run) order
+    results = np.empty(total, dtype=RESULT_DTYPE)
+    with multiprocessing.Pool(processes=worker_count(total), initializer=_init_worker, initargs=(base, loads)) as pool:
+        last_ui = 0.0
+        for curr, (k, row, micro) in enumerate(pool.imap_unordered(_run_single, tasks, chunksize=4), 1):
+            results[k] = row
+            if micro is not None: micro_dump.append(micro)
+            # Throttled by wall time (<= 10 updates/s), not by result count
+            now = time.perf_counter()
+            if now - last_ui >= 0.1 or curr == total:
+                prog.progress(curr/total); stat.text(f"Simulating {curr}/{total}")
+                last_ui = now
+    
+    mc_df = pd.DataFrame(results)
+    mc_df["Strategy"] = mc_df["Strategy"].astype("category")
+    mc_df.attrs["master_seed"] = master_seed  # travels with the frame (and the export's meta.json)
+    micro_df = micro_frame(micro_dump) if micro_dump else None
+    return mc_df, micro_df
+
+@st.cache_data(show_spinner="Simulating the day...", max_entries=16)
+def precompute_demo(traffic_multiplier, skip, seed=42):
+    """All live-demo frames for one (load, speed); the Page 1 loop only plays them back."""
+    from src.demo import demo_frames
+    return list(demo_frames(traffic_multiplier, skip, seed))
+
+def data_key(summary_df, micro_df):
+    """Content hash of a dataset, computed once when it lands in session state."""
+    frames = [summary_df] if micro_df is None else [summary_df, micro_df]
+    return tuple(int(pd.util.hash_pandas_object(d, index=False).sum()) for d in frames)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def analytics_summary(key, _df):
+    """The per (load, strategy) aggregates behind most charts, computed once per dataset."""
+    from src.analytics import summarize
+    return summarize(_df)
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def analytics_figure(key, name, _df, _df_micro, **kwargs):
+    """
+    One ScientificPlotter figure, cached on the dataset's content key rather than by
+    re-hashing the frames: tab switches and widget clicks reuse the built Plotly figures.
+    """
+    from src.analytics import ScientificPlotter
+    return getattr(ScientificPlotter(_df, _df_micro, analytics_summary(key, _df)), name)(**kwargs)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def export_results_zip(summary_df, micro_df, fmt):
+    """Serialized once per dataset/format; reruns of the Data Manager reuse the bytes."""
+    return create_results_zip(summary_df, micro_df, fmt)
+
+@st.cache_data(show_spinner="Reading file...", max_entries=4)
+def import_results(name, data):
+    """Parsed once per uploaded file (keyed on its bytes); reruns with it still attached reuse the frames."""
+    return load_results_file(io.BytesIO(data), name)
+
+# Partial reruns for the demo widgets where this Streamlit has them (1.33+); full reruns otherwise
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda f: f)
+
+@_fragment
+def live_demo():
+    """Page 1 twin: its sliders and button rerun only this block, not the whole page."""
+    with st.expander("⚙️ Configure Simulation Parameters", expanded=True):
+        c1, c2 = st.columns([1, 2])
+        with c1:
+            st.markdown("**Agent Types:**")
+            st.markdown("- <span style='color:red'><b>Critical</b></span>: High Value. Bids aggressively.", unsafe_allow_html=True)
+            st.markdown("- <span style='color:blue'><b>Standard</b></span>: Medium Value.", unsafe_allow_html=True)
+            st.markdown("- <span style='color:grey'><b>Economy</b></span>: Low Value. Price sensitive.", unsafe_allow_html=True)
+        with c2:
+            # Slider moves are batched: only the start button reruns anything
+            with st.form("demo_config", border=False):
+                cc1, cc2, cc3 = st.columns(3)
+                with cc1: load = st.select_slider("Traffic Density", ["Normal", "Heavy", "Extreme"], value="Heavy")
+                with cc2: speed = st.select_slider("Animation Speed", ["Normal", "Fast"], value="Fast")
+                with cc3: 
+                    st.write("")
+                    start_btn = st.form_submit_button("▶️ Start Simulation", type="primary", use_container_width=True)
+
+    if start_btn:
+        st.write("---")
+        load_map = {"Normal": 1.0, "Heavy": 1.2, "Extreme": 1.5}
+        skip = 5 if speed == "Normal" else 20
+        interval_ms = 50 if speed == "Normal" else 40
+        
+        # Seeded, so the day is deterministic: simulate once, replay from cache afterwards
+        frames = precompute_demo(load_map[load], skip)
+        
+        # Played back client-side: one component payload, no per-frame websocket round-trips
+        components.html(render_demo_player(frames, interval_ms), height=380)
 
 # --- SIDEBAR NAVIGATION ---
 with st.sidebar:
@@ -105,55 +225,12 @@ if page == "Concept & Demo":
     st.subheader("Interactive Digital Twin")
     st.markdown("Run a live comparison below. Watch how **Critical Agents (Red)** get stuck in FIFO but bypass queues in SIRQ.")
     
-    with st.expander("⚙️ Configure Simulation Parameters", expanded=True):
-        c1, c2 = st.columns([1, 2])
-        with c1:
-            st.markdown("**Agent Types:**")
-            st.markdown("- <span style='color:red'><b>Critical</b></span>: High Value. Bids aggressively.", unsafe_allow_html=True)
-            st.markdown("- <span style='color:blue'><b>Standard</b></span>: Medium Value.", unsafe_allow_html=True)
-            st.markdown("- <span style='color:grey'><b>Economy</b></span>: Low Value. Price sensitive.", unsafe_allow_html=True)
-        with c2:
-            cc1, cc2, cc3 = st.columns(3)
-            with cc1: load = st.select_slider("Traffic Density", ["Normal", "Heavy", "Extreme"], value="Heavy")
-            with cc2: speed = st.select_slider("Animation Speed", ["Normal", "Fast"], value="Fast")
-            with cc3: 
-                st.write("")
-                start_btn = st.button("▶️ Start Simulation", type="primary", use_container_width=True)
-
-    if start_btn:
-        st.write("---")
-        load_map = {"Normal": 1.0, "Heavy": 1.2, "Extreme": 1.5}
-        cfg = {"traffic_multiplier": load_map[load]}
-        
-        # Initialize Twin Models
-        fifo = ChargingStationModel(4, "FIFO", seed=42, user_config=cfg)
-        sirq = ChargingStationModel(4, "SIRQ", seed=42, user_config=cfg)
-        
-        c1, c2 = st.columns(2)
-        with c1: st.subheader("Baseline (FIFO)"); ph1=st.empty(); m1=st.empty()
-        with c2: st.subheader("SIRQ (Auction)"); ph2=st.empty(); m2=st.empty()
-        
-        bar = st.progress(0)
-        skip = 5 if speed == "Normal" else 20
-        sleep_time = 0.05 if speed == "Normal" else 0.001
-        
-        for i in range(1440):
-            fifo.step(); sirq.step()
-            if i % skip == 0:
-                bar.progress((i+1)/1440)
-                # Visual Rendering
-                ph1.markdown(render_station_visual(fifo), unsafe_allow_html=True)
-                ph2.markdown(render_station_visual(sirq), unsafe_allow_html=True)
-                
-                # Live Metrics
-                m1.info(f"**Rev:** ${int(fifo.kpi_revenue)} | **Failures:** {fifo.kpi_failed_critical}\n\n**Price:** ${fifo.current_price:.2f}/kWh | **Lost:** {fifo.kpi_balked_agents}")
-                m2.success(f"**Rev:** ${int(sirq.kpi_revenue)} | **Failures:** {sirq.kpi_failed_critical}\n\n**Price:** ${sirq.current_price:.2f}/kWh | **Lost:** {sirq.kpi_balked_agents}")
-                time.sleep(sleep_time)
+    live_demo()
 
 # =========================================================
 # PAGE 2: SCIENTIFIC SIMULATION
 # =========================================================
-elif page == "Full Simulation":
+elif page == "Scientific Simulation (Lab)":
     st.title("Monte Carlo Simulation")
     st.markdown("Run thousands of iterations across varying traffic loads.")
     
@@ -168,51 +245,17 @@ elif page == "Full Simulation":
         with c2:
             st.markdown("Traffic Composition:")
             pc = st.slider("Critical %", 0.0, 1.0, 0.2); ps = st.slider("Standard %", 0.0, 1.0, 0.6); pe = st.slider("Economy %", 0.0, 1.0, 0.2)
+            master_seed = st.number_input("Master Seed (0 = random)", 0, 2**31 - 1, 0, help="Fix it to reproduce a batch exactly.")
         run_btn = st.form_submit_button("🚀 Run Batch Experiment")
         
     if run_btn:
-        results, micro_dump = [], []
-        prog = st.progress(0); stat = st.empty()
-        total = len(loads) * 2 * n_runs; curr = 0
-        base = {"prob_critical": pc, "prob_standard": ps, "prob_economy": pe}
-        
-        for l in loads:
-            for s in ["FIFO", "SIRQ"]:
-                for i in range(n_runs):
-                    seed = np.random.randint(100000, 999999)
-                    cfg = base.copy(); cfg["traffic_multiplier"] = l
-                    m = ChargingStationModel(4, s, seed=seed, user_config=cfg)
-                    for _ in range(1440): m.step()
-                    
-                    # Data Logging
-                    log = pd.DataFrame(m.agent_log)
-                    sys_log = pd.DataFrame(m.system_log)
-                    
-                    cw = log.query("Profile=='CRITICAL'")['Wait_Time'].mean() if not log.empty else 0
-                    ew = log.query("Profile=='ECONOMY'")['Wait_Time'].mean() if not log.empty else 0
-                    avg_sys_price = sys_log["Current_Price"].mean() if not sys_log.empty else 0.50
-                    
-                    results.append({
-                        "Run_ID": i, "Traffic_Load": l, "Strategy": s, 
-                        "Revenue": m.kpi_revenue, 
-                        "Critical_Failures": m.kpi_failed_critical, 
-                        "Avg_Wait_Critical": cw, "Avg_Wait_Economy": ew, 
-                        "Balked_Agents": m.kpi_balked_agents, 
-                        "Preemptions": m.kpi_preemptions,
-                        "Avg_System_Price": avg_sys_price
-                    })
-                    
-                    # Micro-log capture (First run only to save memory)
-                    if i == 0:
-                        log["Run_ID"] = i; log["Traffic_Load"] = l
-                        micro_dump.append(log)
-                    
-                    curr += 1
-                    if curr % 5 == 0: prog.progress(curr/total); stat.text(f"Simulating {curr}/{total}")
-        
-        st.session_state['monte_carlo_df'] = pd.DataFrame(results)
-        st.session_state['agent_level_df'] = pd.concat(micro_dump) if micro_dump else None
-        st.success("Experiment Complete. Navigate to 'Deep Dive Analytics' to view results.")
+        # "Random" resolves to a fresh concrete seed per click, kept with the results so any batch can be replayed
+        seed = int(master_seed) or int(np.random.SeedSequence().entropy % (2**31 - 2)) + 1
+        mc_df, micro_df = run_monte_carlo(int(n_runs), tuple(loads), pc, ps, pe, seed)
+        st.session_state['monte_carlo_df'] = mc_df
+        st.session_state['agent_level_df'] = micro_df
+        st.session_state['data_key'] = data_key(mc_df, micro_df)
+        st.success(f"Experiment Complete (master seed {mc_df.attrs['master_seed']}). Navigate to 'Deep Dive Analytics' to view results.")
 
 # =========================================================
 # PAGE 3: DEEP DIVE ANALYTICS
@@ -226,115 +269,116 @@ elif page == "Deep Dive Analytics":
     if df is None:
         st.warning("⚠️ No Data. Please run a simulation in the 'Scientific Simulation' tab or Import data.")
     else:
-        plotter = ScientificPlotter(df, df_micro)
+        key = st.session_state['data_key'] or data_key(df, df_micro)
+        
+        def figure(name, **kwargs):
+            return analytics_figure(key, name, df, df_micro, **kwargs)
         
         tab1, tab2, tab3, tab4, tab5 = st.tabs(["Efficiency", "Reliability", "Rationality", "Equity", "🔥 Advanced Heatmaps"])
         
         with tab1:
             st.header("RQ1: Economic Efficiency")
-            st.plotly_chart(plotter.rq1_revenue_ci(), use_container_width=True)
+            st.plotly_chart(figure("rq1_revenue_ci"), use_container_width=True)
             c1, c2 = st.columns(2)
-            with c1: st.plotly_chart(plotter.rq1_revenue_dist(), use_container_width=True)
-            with c2: st.plotly_chart(plotter.rq1_revenue_delta(), use_container_width=True)
+            with c1: st.plotly_chart(figure("rq1_revenue_dist"), use_container_width=True)
+            with c2: st.plotly_chart(figure("rq1_revenue_delta"), use_container_width=True)
             
             c3, c4 = st.columns(2)
-            with c3: st.plotly_chart(plotter.rq1_utilization_proxy(), use_container_width=True)
-            with c4: st.plotly_chart(plotter.rq1_revenue_stability(), use_container_width=True)
+            with c3: st.plotly_chart(figure("rq1_utilization_proxy"), use_container_width=True)
+            with c4: st.plotly_chart(figure("rq1_revenue_stability"), use_container_width=True)
 
         with tab2:
             st.header("RQ2: Service Reliability")
-            st.plotly_chart(plotter.rq2_critical_wait_box(), use_container_width=True)
+            st.plotly_chart(figure("rq2_critical_wait_box"), use_container_width=True)
             c1, c2 = st.columns(2)
-            with c1: st.plotly_chart(plotter.rq2_failure_rate(), use_container_width=True)
-            with c2: st.plotly_chart(plotter.rq2_ecdf_wait(), use_container_width=True)
+            with c1: st.plotly_chart(figure("rq2_failure_rate"), use_container_width=True)
+            with c2: st.plotly_chart(figure("rq2_ecdf_wait"), use_container_width=True)
             
             c3, c4 = st.columns(2)
             with c3: 
-                f = plotter.rq2_max_wait_analysis()
+                f = figure("rq2_max_wait_analysis")
                 if f: st.plotly_chart(f, use_container_width=True)
             with c4: 
-                f = plotter.rq2_on_time_performance()
+                f = figure("rq2_on_time_performance")
                 if f: st.plotly_chart(f, use_container_width=True)
 
         with tab3:
             st.header("RQ3: Pricing Dynamics")
             c1, c2 = st.columns(2)
-            with c1: st.plotly_chart(plotter.rq3_price_trend(), use_container_width=True)
-            with c2: st.plotly_chart(plotter.rq3_demand_loss(), use_container_width=True)
+            with c1: st.plotly_chart(figure("rq3_price_trend"), use_container_width=True)
+            with c2: st.plotly_chart(figure("rq3_demand_loss"), use_container_width=True)
             
             st.divider()
             st.subheader("Agent Behavior")
             if df_micro is not None:
                 c3, c4 = st.columns(2)
-                with c3: st.plotly_chart(plotter.rq3_bidding_rationality(), use_container_width=True)
-                with c4: st.plotly_chart(plotter.rq3_winning_bid_trend(), use_container_width=True)
+                with c3: st.plotly_chart(figure("rq3_bidding_rationality"), use_container_width=True)
+                with c4: st.plotly_chart(figure("rq3_winning_bid_trend"), use_container_width=True)
             else:
                 st.warning("Micro-data missing.")
-            st.plotly_chart(plotter.rq3_welfare_loss(), use_container_width=True)
+            st.plotly_chart(figure("rq3_welfare_loss"), use_container_width=True)
 
         with tab4:
             st.header("RQ4: Social Equity")
             if df_micro is not None:
-                st.plotly_chart(plotter.rq4_price_paid_by_profile(), use_container_width=True)
+                st.plotly_chart(figure("rq4_price_paid_by_profile"), use_container_width=True)
             
             c1, c2 = st.columns(2)
-            with c1: st.plotly_chart(plotter.rq4_equity_gap(), use_container_width=True)
-            with c2: st.plotly_chart(plotter.rq4_starvation_scatter(), use_container_width=True)
+            with c1: st.plotly_chart(figure("rq4_equity_gap"), use_container_width=True)
+            with c2: st.plotly_chart(figure("rq4_starvation_scatter"), use_container_width=True)
             
             st.divider()
             st.subheader("Policy Solution: Redistribution")
-            st.plotly_chart(plotter.rq4_subsidy_potential(), use_container_width=True)
+            st.plotly_chart(figure("rq4_subsidy_potential"), use_container_width=True)
 
         with tab5:
             st.header("Sensitivity & Multi-Variable Analysis")
             
             col1, col2 = st.columns(2)
             with col1:
-                st.plotly_chart(plotter.plot_sensitivity_heatmap(metric="Revenue"), use_container_width=True)
+                st.plotly_chart(figure("plot_sensitivity_heatmap", metric="Revenue"), use_container_width=True)
             with col2:
-                st.plotly_chart(plotter.plot_sensitivity_heatmap(metric="Avg_Wait_Critical"), use_container_width=True)
+                st.plotly_chart(figure("plot_sensitivity_heatmap", metric="Avg_Wait_Critical"), use_container_width=True)
         
             st.divider()
             
             col3, col4 = st.columns(2)
             with col3:
-                st.plotly_chart(plotter.plot_correlation_matrix(), use_container_width=True)
+                st.plotly_chart(figure("plot_correlation_matrix"), use_container_width=True)
             with col4:
-                st.plotly_chart(plotter.plot_balking_heatmap(), use_container_width=True)
+                st.plotly_chart(figure("plot_balking_heatmap"), use_container_width=True)
                 
             st.divider()
             st.subheader("3D Frontier Analysis")
-            st.plotly_chart(plotter.plot_3d_efficiency_surface(), use_container_width=True)
+            st.plotly_chart(figure("plot_3d_efficiency_surface"), use_container_width=True)
 
 # =========================================================
 # PAGE 4: DATA MANAGER
 # =========================================================
 elif page == "Data Manager":
     st.title("Data Manager")
-    st.markdown("Export or Import experiment data (ZIP format) to save your work or share with peers.")
+    st.markdown("Export or Import experiment data (ZIP, or a bare Parquet/CSV summary) to save your work or share with peers.")
     
     c1, c2 = st.columns(2)
     with c1:
         st.subheader("Export")
         if st.session_state['monte_carlo_df'] is not None:
-            buf = io.BytesIO()
-            with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
-                zf.writestr("summary.csv", st.session_state['monte_carlo_df'].to_csv(index=False))
-                if st.session_state['agent_level_df'] is not None:
-                    zf.writestr("micro.csv", st.session_state['agent_level_df'].to_csv(index=False))
-            st.download_button("Download Data (.zip)", buf.getvalue(), "sirq_experiment.zip", "application/zip")
+            fmt = st.radio("Format", ["parquet", "csv"], horizontal=True, help="Parquet is smaller and faster to reload; CSV opens in any spreadsheet.")
+            data = export_results_zip(st.session_state['monte_carlo_df'], st.session_state['agent_level_df'], fmt)
+            st.download_button("Download Data (.zip)", data, "sirq_experiment.zip", "application/zip")
         else:
             st.info("No data available to export.")
             
     with c2:
         st.subheader("Import")
-        f = st.file_uploader("Upload .zip file", type="zip")
+        f = st.file_uploader("Upload .zip, .parquet or .csv file", type=["zip", "parquet", "csv"])
         if f:
             try:
-                with zipfile.ZipFile(f, "r") as zf:
-                    st.session_state['monte_carlo_df'] = pd.read_csv(io.BytesIO(zf.read("summary.csv")))
-                    if "micro.csv" in zf.namelist():
-                        st.session_state['agent_level_df'] = pd.read_csv(io.BytesIO(zf.read("micro.csv")))
+                summary_df, micro_df = import_results(f.name, f.getvalue())
+                st.session_state['monte_carlo_df'] = summary_df
+                if micro_df is not None:
+                    st.session_state['agent_level_df'] = micro_df
+                st.session_state['data_key'] = data_key(summary_df, st.session_state['agent_level_df'])
                 st.success("Data successfully loaded!")
             except Exception as e:
                 st.error(f"Import failed: {e}")
@@ -1,5 +1,4 @@
 import mesa
-import numpy as np
 from src.config import TRUCK_PROFILES
 
 class TruckAgent(mesa.Agent):
@@ -15,10 +14,10 @@ class TruckAgent(mesa.Agent):
         
         # --- 2. Determine "Value of Time" (VOT) ---
         vot_min, vot_max = profile_data["vot_range"]
-        self.value_of_time = np.random.uniform(vot_min, vot_max)
+        self.value_of_time = model.np_random.uniform(vot_min, vot_max)
         
         # --- 3. Physics State ---
-        self.soc = np.random.randint(10, 30)
+        self.soc = model.np_random.randint(10, 30)
         self.target_soc = 85
         self.wait_time = 0
         self.status = "Queuing"
@@ -27,6 +26,11 @@ class TruckAgent(mesa.Agent):
         self.charged_kwh = 0.0
         self.incurred_cost = 0.0
         
+        # Per-tick constants, resolved once instead of on every _wait/_charge call
+        self.patience = profile_data["patience"]
+        self.kwh_per_step = config["charger_power"] / 60.0
+        self.capacity = config["battery_capacity"]
+        
         # --- 4. Rational Bidding Calculation ---
         self._calculate_initial_bid()
 
@@ -38,14 +42,14 @@ class TruckAgent(mesa.Agent):
         base_fee = self.config.get("base_service_fee", 10.0)
         
         # Heuristic: Agents estimate queue wait. 
-        queue_len = len([a for a in self.model.schedule.agents if a.status == "Queuing"])
+        queue_len = len(self.model.queue_agents)
         estimated_wait_hours = (queue_len * 15) / 60.0 
         
         if estimated_wait_hours < 0.1: estimated_wait_hours = 0.1
         
         # THE CORE FORMULA
         rational_bid = base_fee + (self.value_of_time * estimated_wait_hours)
-        noise = np.random.uniform(0.9, 1.1) 
+        noise = self.model.np_random.uniform(0.9, 1.1) 
         
         self.bid = round(rational_bid * noise, 2)
 
@@ -63,21 +67,14 @@ class TruckAgent(mesa.Agent):
             self.bid += (self.value_of_time / 4) 
         
         # --- Patience / Leaving Logic ---
-        patience_limit = TRUCK_PROFILES[self.profile_type]["patience"]
-        
-        if self.wait_time > patience_limit:
+        if self.wait_time > self.patience:
             self.model.log_departure(self, "Left (Impatient)")
-            self.model.grid.remove_agent(self)
             self.model.schedule.remove(self)
 
     def _charge(self):
-        power = self.config["charger_power"]
-        capacity = self.config["battery_capacity"]
-        
-        kwh_added = power / 60.0
         efficiency = 1.0 if self.soc < 80 else 0.5
-        real_kwh = kwh_added * efficiency
-        real_soc = (real_kwh / capacity) * 100
+        real_kwh = self.kwh_per_step * efficiency
+        real_soc = (real_kwh / self.capacity) * 100
 
         self.soc += real_soc
         self.charged_kwh += real_kwh # Track Energy
@@ -93,5 +90,4 @@ class TruckAgent(mesa.Agent):
         if self.soc >= self.target_soc:
             self.model.log_departure(self, "Completed")
             self.model.charging_spots += 1
-            self.model.grid.remove_agent(self)
             self.model.schedule.remove(self)
\ No newline at end of file
@@ -2,12 +2,23 @@ import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
+
+def summarize(df):
+    """
+    Per (Traffic_Load, Strategy) aggregates shared by most charts: the mean of every
+    KPI plus Revenue std/count for the CI band, from a single groupby.
+    """
+    g = df.groupby(["Traffic_Load", "Strategy"], observed=True)
+    summary = g.mean(numeric_only=True)
+    summary["Revenue_std"] = g["Revenue"].std()
+    summary["count"] = g.size()
+    return summary.reset_index()
 
 class ScientificPlotter:
-    def __init__(self, df, df_micro=None):
+    def __init__(self, df, df_micro=None, summary=None):
         self.df = df
         self.df_micro = df_micro
+        self.summary = summary if summary is not None else summarize(df)
         self.colors = {"FIFO": "#3498db", "SIRQ": "#2ecc71"}
         self.profile_colors = {"CRITICAL": "#ff4b4b", "STANDARD": "#3498db", "ECONOMY": "#95a5a6"}
 
@@ -15,12 +26,11 @@ class ScientificPlotter:
     # RQ1: ECONOMIC EFFICIENCY
     # =========================================================================
     def rq1_revenue_ci(self):
-        summary = self.df.groupby(["Traffic_Load", "Strategy"])["Revenue"].agg(["mean", "std", "count"]).reset_index()
-        summary['ci'] = 1.96 * (summary['std'] / np.sqrt(summary['count']))
+        summary = self.summary.assign(ci=1.96 * (self.summary["Revenue_std"] / np.sqrt(self.summary["count"])))
         fig = go.Figure()
         for s in self.df["Strategy"].unique():
             sub = summary[summary["Strategy"] == s]
-            fig.add_trace(go.Scatter(x=sub["Traffic_Load"], y=sub["mean"], error_y=dict(type='data', array=sub['ci'], visible=True), mode='lines+markers', name=s, line=dict(color=self.colors.get(s, "gray"))))
+            fig.add_trace(go.Scatter(x=sub["Traffic_Load"], y=sub["Revenue"], error_y=dict(type='data', array=sub['ci'], visible=True), mode='lines+markers', name=s, line=dict(color=self.colors.get(s, "gray"))))
         fig.update_layout(title="<b>Mean Revenue vs Load</b> (95% CI)", xaxis_title="Traffic Load", yaxis_title="Revenue ($)", template="plotly_white")
         return fig
 
@@ -30,30 +40,30 @@ class ScientificPlotter:
         return fig
 
     def rq1_revenue_delta(self):
-        pivoted = self.df.pivot_table(index=["Traffic_Load"], columns="Strategy", values="Revenue", aggfunc="mean")
+        pivoted = self.summary.pivot(index="Traffic_Load", columns="Strategy", values="Revenue")
         if "FIFO" in pivoted.columns and "SIRQ" in pivoted.columns:
-            pivoted["Delta_Pct"] = ((pivoted["SIRQ"] - pivoted["FIFO"]) / pivoted["FIFO"]) * 100
-            pivoted = pivoted.reset_index()
-            fig = px.bar(pivoted, x="Traffic_Load", y="Delta_Pct", text_auto='.1f', title="<b>Relative Revenue Gain (SIRQ vs FIFO)</b>", color="Delta_Pct", color_continuous_scale="Greens")
+            # Built as a Series: the pivot's columns may be a CategoricalIndex (Strategy dtype)
+            delta = (((pivoted["SIRQ"] - pivoted["FIFO"]) / pivoted["FIFO"]) * 100).rename("Delta_Pct").reset_index()
+            fig = px.bar(delta, x="Traffic_Load", y="Delta_Pct", text_auto='.1f', title="<b>Relative Revenue Gain (SIRQ vs FIFO)</b>", color="Delta_Pct", color_continuous_scale="Greens")
             fig.update_layout(yaxis_title="% Improvement", template="plotly_white")
             return fig
         return None
 
     def rq1_utilization_proxy(self):
-        self.df["Rev_Per_Unit"] = self.df["Revenue"] / self.df["Traffic_Load"]
-        fig = px.box(self.df, x="Traffic_Load", y="Rev_Per_Unit", color="Strategy", title="<b>Revenue Efficiency per Unit of Traffic</b>", color_discrete_map=self.colors)
+        df = self.df.assign(Rev_Per_Unit=self.df["Revenue"] / self.df["Traffic_Load"])
+        fig = px.box(df, x="Traffic_Load", y="Rev_Per_Unit", color="Strategy", title="<b>Revenue Efficiency per Unit of Traffic</b>", color_discrete_map=self.colors)
         return fig
 
     def rq1_opportunity_cost(self):
         # Includes Balked Agents (Lost Demand)
-        if "Balked_Agents" not in self.df.columns:
-            self.df["Balked_Agents"] = 0
-        self.df["Lost_Rev"] = (self.df["Critical_Failures"] + self.df["Balked_Agents"]) * 50 
-        fig = px.bar(self.df.groupby(["Traffic_Load", "Strategy"])["Lost_Rev"].mean().reset_index(), x="Traffic_Load", y="Lost_Rev", color="Strategy", barmode="group", title="<b>Est. Lost Opportunity (Failures + Balking)</b>", color_discrete_map=self.colors)
+        balked = self.summary["Balked_Agents"] if "Balked_Agents" in self.summary.columns else 0
+        df = self.summary.assign(Lost_Rev=(self.summary["Critical_Failures"] + balked) * 50)
+        fig = px.bar(df, x="Traffic_Load", y="Lost_Rev", color="Strategy", barmode="group", title="<b>Est. Lost Opportunity (Failures + Balking)</b>", color_discrete_map=self.colors)
         return fig
 
     def rq1_revenue_stability(self):
-        cv = self.df.groupby(["Traffic_Load", "Strategy"])["Revenue"].agg(lambda x: x.std() / x.mean() * 100).reset_index().rename(columns={"Revenue": "CV"})
+        # std/mean straight from the shared summary: no per-group Python lambda
+        cv = self.summary.assign(CV=self.summary["Revenue_std"] / self.summary["Revenue"] * 100)
         fig = px.line(cv, x="Traffic_Load", y="CV", color="Strategy", markers=True, title="<b>Revenue Volatility (CV)</b>", color_discrete_map=self.colors)
         return fig
 
@@ -66,7 +76,7 @@ class ScientificPlotter:
         return fig
 
     def rq2_failure_rate(self):
-        fig = px.line(self.df.groupby(["Traffic_Load", "Strategy"])["Critical_Failures"].mean().reset_index(), x="Traffic_Load", y="Critical_Failures", color="Strategy", markers=True, title="<b>System Collapse Rate (Critical Failures)</b>", color_discrete_map=self.colors)
+        fig = px.line(self.summary, x="Traffic_Load", y="Critical_Failures", color="Strategy", markers=True, title="<b>System Collapse Rate (Critical Failures)</b>", color_discrete_map=self.colors)
         return fig
 
     def rq2_ecdf_wait(self):
@@ -78,7 +88,7 @@ class ScientificPlotter:
     def rq2_max_wait_analysis(self):
         if self.df_micro is not None:
             crit = self.df_micro[self.df_micro["Profile"] == "CRITICAL"]
-            max_waits = crit.groupby(["Traffic_Load", "Strategy"])["Wait_Time"].max().reset_index()
+            max_waits = crit.groupby(["Traffic_Load", "Strategy"], observed=True)["Wait_Time"].max().reset_index()
             fig = px.bar(max_waits, x="Traffic_Load", y="Wait_Time", color="Strategy", barmode="group", title="<b>Worst-Case Scenario (Max Wait)</b>", color_discrete_map=self.colors)
             return fig
         return None
@@ -88,7 +98,7 @@ class ScientificPlotter:
             # FIX: Use .copy() to avoid SettingWithCopyWarning
             crit = self.df_micro[self.df_micro["Profile"] == "CRITICAL"].copy()
             crit["On_Time"] = crit["Wait_Time"] <= 15
-            otp = crit.groupby(["Traffic_Load", "Strategy"])["On_Time"].mean().reset_index()
+            otp = crit.groupby(["Traffic_Load", "Strategy"], observed=True)["On_Time"].mean().reset_index()
             fig = px.line(otp, x="Traffic_Load", y="On_Time", color="Strategy", markers=True, title="<b>On-Time Performance (% Served < 15m)</b>", color_discrete_map=self.colors)
             fig.update_layout(yaxis_tickformat=".0%")
             return fig
@@ -96,7 +106,7 @@ class ScientificPlotter:
 
     def rq2_preemption_turbulence(self):
         if "Preemptions" in self.df.columns:
-            fig = px.bar(self.df.groupby(["Traffic_Load", "Strategy"])["Preemptions"].mean().reset_index(), x="Traffic_Load", y="Preemptions", color="Strategy", title="<b>Queue Turbulence (Preemptions)</b>", color_discrete_map=self.colors)
+            fig = px.bar(self.summary, x="Traffic_Load", y="Preemptions", color="Strategy", title="<b>Queue Turbulence (Preemptions)</b>", color_discrete_map=self.colors)
             return fig
         return None
 
@@ -110,7 +120,7 @@ class ScientificPlotter:
         Demonstrates that FIFO also suffers from surge pricing, not just SIRQ.
         """
         if "Avg_System_Price" in self.df.columns:
-            fig = px.line(self.df.groupby(["Traffic_Load", "Strategy"])["Avg_System_Price"].mean().reset_index(), 
+            fig = px.line(self.summary, 
                           x="Traffic_Load", y="Avg_System_Price", color="Strategy", markers=True, 
                           title="<b>System Price Evolution ($/kWh)</b>", color_discrete_map=self.colors)
             return fig
@@ -122,7 +132,7 @@ class ScientificPlotter:
         Compares if one strategy triggers more balking than the other.
         """
         if "Balked_Agents" in self.df.columns:
-            fig = px.bar(self.df.groupby(["Traffic_Load", "Strategy"])["Balked_Agents"].mean().reset_index(), 
+            fig = px.bar(self.summary, 
                          x="Traffic_Load", y="Balked_Agents", color="Strategy", barmode="group",
                          title="<b>Demand Destruction (Lost Customers)</b>", color_discrete_map=self.colors)
             return fig
@@ -137,8 +147,9 @@ class ScientificPlotter:
         return fig
 
     def rq3_welfare_loss(self):
-        self.df["Estimated_Pain"] = ((self.df["Avg_Wait_Critical"]/60 * 225) + (self.df["Avg_Wait_Economy"]/60 * 22))
-        fig = px.bar(self.df.groupby(["Traffic_Load", "Strategy"])["Estimated_Pain"].mean().reset_index(),
+        # Linear in the waits, so the mean of the pain is the pain of the means
+        df = self.summary.assign(Estimated_Pain=(self.summary["Avg_Wait_Critical"]/60 * 225) + (self.summary["Avg_Wait_Economy"]/60 * 22))
+        fig = px.bar(df,
                      x="Traffic_Load", y="Estimated_Pain", color="Strategy", barmode="group",
                      title="<b>Total Societal Welfare Loss (Wait Cost $)</b>", color_discrete_map=self.colors)
         return fig
@@ -158,7 +169,7 @@ class ScientificPlotter:
 
     def rq3_profile_win_rate(self):
         if self.df_micro is None: return None
-        counts = self.df_micro[self.df_micro["Strategy"]=="SIRQ"].groupby(["Profile", "Outcome"]).size().unstack(fill_value=0)
+        counts = self.df_micro[self.df_micro["Strategy"]=="SIRQ"].groupby(["Profile", "Outcome"], observed=True).size().unstack(fill_value=0)
         if "Completed" in counts.columns:
             counts["Win_Rate"] = counts["Completed"] / counts.sum(axis=1)
             fig = px.bar(counts.reset_index(), x="Profile", y="Win_Rate", title="<b>Profile Win Rate</b>", color="Profile", color_discrete_map=self.profile_colors)
@@ -178,15 +189,14 @@ class ScientificPlotter:
         if "Avg_Price_kWh" in self.df_micro.columns:
             # Filter for completed sessions only (cost > 0)
             paid = self.df_micro[self.df_micro["Avg_Price_kWh"] > 0]
-            summary = paid.groupby(["Strategy", "Profile"])["Avg_Price_kWh"].mean().reset_index()
+            summary = paid.groupby(["Strategy", "Profile"], observed=True)["Avg_Price_kWh"].mean().reset_index()
             fig = px.bar(summary, x="Profile", y="Avg_Price_kWh", color="Strategy", barmode="group",
                          title="<b>Cost Equity: Who Pays More? ($/kWh)</b>", color_discrete_map=self.colors)
             return fig
         return None
 
     def rq4_equity_gap(self):
-        self.df["Equity_Gap"] = self.df["Avg_Wait_Economy"] - self.df["Avg_Wait_Critical"]
-        summary = self.df.groupby(["Traffic_Load", "Strategy"])["Equity_Gap"].mean().reset_index()
+        summary = self.summary.assign(Equity_Gap=self.summary["Avg_Wait_Economy"] - self.summary["Avg_Wait_Critical"])
         fig = px.line(summary, x="Traffic_Load", y="Equity_Gap", color="Strategy", markers=True, title="<b>Equity Gap (Economy Wait - Critical Wait)</b>", color_discrete_map=self.colors)
         return fig
     
@@ -197,11 +207,10 @@ class ScientificPlotter:
         return fig
 
     def rq4_subsidy_potential(self):
-        pivot = self.df.pivot_table(index="Traffic_Load", columns="Strategy", values="Revenue", aggfunc="mean")
+        pivot = self.summary.pivot(index="Traffic_Load", columns="Strategy", values="Revenue")
         if "FIFO" in pivot.columns and "SIRQ" in pivot.columns:
-            pivot["Subsidy_Pool"] = pivot["SIRQ"] - pivot["FIFO"]
-            pivot = pivot.reset_index()
-            fig = px.area(pivot, x="Traffic_Load", y="Subsidy_Pool", title="<b>Potential Subsidy Pool (Extra Revenue)</b>", color_discrete_sequence=["#27ae60"])
+            pool = (pivot["SIRQ"] - pivot["FIFO"]).rename("Subsidy_Pool").reset_index()
+            fig = px.area(pool, x="Traffic_Load", y="Subsidy_Pool", title="<b>Potential Subsidy Pool (Extra Revenue)</b>", color_discrete_sequence=["#27ae60"])
             return fig
         return None
 
@@ -213,7 +222,7 @@ class ScientificPlotter:
                 total += np.sum(np.abs(xi - x[i:]))
             return total / (len(x)**2 * np.mean(x)) if len(x) > 0 and np.mean(x) > 0 else 0
         ginis = []
-        for (load, strat), group in self.df_micro.groupby(["Traffic_Load", "Strategy"]):
+        for (load, strat), group in self.df_micro.groupby(["Traffic_Load", "Strategy"], observed=True):
             g = gini(group["Wait_Time"].values)
             ginis.append({"Traffic_Load": load, "Strategy": strat, "Gini": g})
         fig = px.line(pd.DataFrame(ginis), x="Traffic_Load", y="Gini", color="Strategy", markers=True, title="<b>Gini Coefficient (Inequality)</b>", color_discrete_map=self.colors)
@@ -222,7 +231,7 @@ class ScientificPlotter:
     def rq4_starvation_depth(self):
         if self.df_micro is None: return None
         eco = self.df_micro[self.df_micro["Profile"] == "ECONOMY"]
-        depth = eco.groupby(["Traffic_Load", "Strategy"])["Wait_Time"].max().reset_index()
+        depth = eco.groupby(["Traffic_Load", "Strategy"], observed=True)["Wait_Time"].max().reset_index()
         fig = px.bar(depth, x="Traffic_Load", y="Wait_Time", color="Strategy", barmode="group", title="<b>Starvation Depth (Max Eco Wait)</b>", color_discrete_map=self.colors)
         return fig
     
@@ -247,7 +256,7 @@ class ScientificPlotter:
         Great for spotting 'hotspots' of failure or profit.
         """
         # Pivot data to get Matrix form: Index=Load, Columns=Strategy, Values=Metric
-        pivot = self.df.pivot_table(index="Traffic_Load", columns="Strategy", values=metric, aggfunc="mean")
+        pivot = self.summary.pivot(index="Traffic_Load", columns="Strategy", values=metric)
         
         fig = px.imshow(
             pivot, 
@@ -287,10 +296,7 @@ class ScientificPlotter:
         X=Load, Y=Wait Time, Z=Revenue.
         """
         # Aggregate data
-        agg = self.df.groupby(["Traffic_Load", "Strategy"]).agg({
-            "Revenue": "mean",
-            "Avg_Wait_Critical": "mean"
-        }).reset_index()
+        agg = self.summary
 
         fig = go.Figure()
 
@@ -309,7 +315,7 @@ class ScientificPlotter:
         """
         if "Balked_Agents" not in self.df.columns: return None
         
-        pivot = self.df.pivot_table(index="Traffic_Load", columns="Strategy", values="Balked_Agents", aggfunc="mean")
+        pivot = self.summary.pivot(index="Traffic_Load", columns="Strategy", values="Balked_Agents")
         
         fig = px.imshow(pivot, labels=dict(x="Strategy", y="Traffic Load", color="Lost Agents"), color_continuous_scale="Magma", text_auto=".0f")
         return self._apply_science_style(fig, "<b>Risk Analysis: Lost Customers (Balking)</b>")
\ No newline at end of file
@@ -0,0 +1,96 @@
+import os
+import numpy as np
+import pandas as pd
+from src.model import ChargingStationModel, AGENT_LOG_COLUMNS
+from src.config import PROFILE_IDS, TRUCK_PROFILES
+
+# One row of the Monte Carlo summary (field order = tuple returned by _run_single)
+# Counters fit int16 (<= 1440 events/day, N <= 200); KPIs need ~6 digits -> float32.
+# Traffic_Load stays float64 so loads like 1.2 keep their exact labels in plots.
+RESULT_DTYPE = np.dtype([
+    ("Run_ID", "i2"), ("Traffic_Load", "f8"), ("Strategy", "U4"),
+    ("Revenue", "f4"), ("Critical_Failures", "i2"),
+    ("Avg_Wait_Critical", "f4"), ("Avg_Wait_Economy", "f4"),
+    ("Balked_Agents", "i2"), ("Preemptions", "i2"), ("Avg_System_Price", "f4")
+])
+
+# Agent-level micro-log columns, same reasoning: ids/waits are small ints, money/VOT
+# values are rounded to 2 decimals (float32 is plenty), repeated labels -> categoricals.
+MICRO_DTYPES = {
+    "ID": "i4", "Urgency": "f4", "Value_of_Time": "f4", "Bid": "f4",
+    "Outcome": "category", "Wait_Time": "i2", "Strategy": "category",
+    "Cost_Paid": "f4", "Avg_Price_kWh": "f4"
+}
+
+def worker_count(n_tasks):
+    """
+    Pool size for a batch: the CPUs this process may actually run on (affinity mask,
+    e.g. taskset / docker --cpuset-cpus), never more than there are tasks.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS / Windows
+        cpus = os.cpu_count() or 1
+    return max(1, min(cpus, n_tasks))
+
+# Read-only per-load configs, installed once per worker process by _init_worker
+_CFG_BY_LOAD = {}
+
+def _init_worker(base_cfg, loads):
+    """
+    Pool initializer: ship the shared config once per worker, not once per task, and
+    build one config per traffic load up front (the model only reads user_config).
+    """
+    global _CFG_BY_LOAD
+    _CFG_BY_LOAD = {load: {**base_cfg, "traffic_multiplier": load} for load in loads}
+
+def _run_single(args):
+    """
+    Runs one Monte Carlo replication (one simulated day) and returns its KPIs.
+    Lives at module level so it can be pickled into a multiprocessing.Pool.
+    Returns (task_index, result_row, micro_log_or_None); the micro log is the raw
+    (load, agent_log) pair, turned into one frame for the whole batch by micro_frame.
+    """
+    k, run_id, seed, strategy, load = args
+
+    # Every task seeds its own model, so workers never share an RNG stream
+    # Only run 0 feeds the micro-log; the other replications skip per-agent logging entirely
+    m = ChargingStationModel(4, strategy, seed=seed, user_config=_CFG_BY_LOAD[load], record_agents=(run_id == 0))
+    m.run(1440)
+
+    # Wait-time KPIs from the model's running per-profile totals (no log scan, no DataFrame)
+    def mean_wait(profile):
+        pid = PROFILE_IDS[profile]
+        n = m.wait_count_by_profile[pid]
+        return m.wait_sum_by_profile[pid] / n if n else 0
+    cw, ew = mean_wait("CRITICAL"), mean_wait("ECONOMY")
+
+    avg_sys_price = m.logged_price_sum / len(m.system_log) if m.system_log else 0.50
+
+    result = (
+        run_id, load, strategy,
+        m.kpi_revenue,
+        m.kpi_failed_critical,
+        cw, ew,
+        m.kpi_balked_agents,
+        m.kpi_preemptions,
+        avg_sys_price
+    )
+
+    # Micro-log capture (First run only to save memory; nothing to ship if nobody left)
+    micro = (load, m.agent_log) if run_id == 0 and m.agent_log else None
+
+    return k, result, micro
+
+def micro_frame(logs):
+    """
+    Agent-level frame for a whole batch from the workers' (load, agent_log) pairs:
+    one from_records call instead of a DataFrame per run plus a concat.
+    Only run 0 of each scenario is logged, hence the constant Run_ID.
+    """
+    df = pd.DataFrame.from_records([row for _, log in logs for row in log], columns=AGENT_LOG_COLUMNS)
+    df = df.astype(MICRO_DTYPES)
+    df["Profile"] = pd.Categorical(df["Profile"], categories=list(TRUCK_PROFILES))
+    df["Run_ID"] = np.int16(0)
+    df["Traffic_Load"] = np.repeat([load for load, _ in logs], [len(log) for _, log in logs])
+    return df
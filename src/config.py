@@ -85,4 +85,7 @@ TRUCK_PROFILES = {
         "color": "#95a5a6",          # Gray
         "border": "1px dashed #7f8c8d"
     }
-}
\ No newline at end of file
+}
+
+# Integer codes for the profiles (column order of the model's departure arrays)
+PROFILE_IDS = {name: i for i, name in enumerate(TRUCK_PROFILES)}
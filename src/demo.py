@@ -0,0 +1,22 @@
+from src.model import ChargingStationModel
+from src.vis_utils import render_station_visual, render_kpi_panel
+
+FIFO_BG = "rgba(28, 131, 225, 0.1)"   # st.info tint
+SIRQ_BG = "rgba(33, 195, 84, 0.1)"    # st.success tint
+
+def demo_frames(traffic_multiplier, skip, seed=42):
+    """
+    Simulates one day of the FIFO/SIRQ twins and yields a
+    (tick, fifo_html, sirq_html) snapshot every `skip` ticks.
+    """
+    cfg = {"traffic_multiplier": traffic_multiplier}
+    fifo = ChargingStationModel(4, "FIFO", seed=seed, user_config=cfg)
+    sirq = ChargingStationModel(4, "SIRQ", seed=seed, user_config=cfg)
+    
+    for frame in range(1440 // skip):
+        for _ in range(skip): fifo.step(); sirq.step()
+        yield (
+            (frame + 1) * skip,
+            render_station_visual(fifo) + render_kpi_panel(fifo, FIFO_BG),
+            render_station_visual(sirq) + render_kpi_panel(sirq, SIRQ_BG)
+        )
@@ -1,27 +1,54 @@
 import mesa
+import heapq
+import itertools
+from bisect import bisect_right
+from operator import attrgetter
 import pandas as pd
 import numpy as np
 from src.agents import TruckAgent
-from src.config import DEFAULT_CONFIG, TRUCK_PROFILES
+from src.config import DEFAULT_CONFIG, TRUCK_PROFILES, PROFILE_IDS
+
+# Field order of the tuples in ChargingStationModel.agent_log
+AGENT_LOG_COLUMNS = (
+    "ID", "Profile", "Urgency", "Value_of_Time", "Bid", "Outcome",
+    "Wait_Time", "Strategy", "Cost_Paid", "Avg_Price_kWh"
+)
+
+# Field order of the tuples in ChargingStationModel.system_log (one per tick)
+SYSTEM_LOG_COLUMNS = (
+    "Step", "Total_Revenue", "Queue_Length", "Strategy", "Current_Price", "Balked_Agents"
+)
+
+_PROFILE_CHOICES = ("CRITICAL", "STANDARD", "ECONOMY")
+
+# Queue ordering keys (C-level getters instead of a Python lambda call per truck)
+_BY_ID = attrgetter("unique_id")
+_BY_BID = attrgetter("bid")
 
 class ChargingStationModel(mesa.Model):
-    def __init__(self, num_chargers, strategy="FIFO", seed=None, user_config=None):
+    def __init__(self, num_chargers, strategy="FIFO", seed=None, user_config=None, record_agents=True):
         super().__init__()
         self._seed = seed
         if seed is not None:
             self.random.seed(seed)
-            np.random.seed(seed)
+        # Per-model NumPy stream (not the global one) so twin models stay independent
+        self.np_random = np.random.RandomState(seed)
             
         # MERGE Config: Defaults + User Overrides
         self.config = DEFAULT_CONFIG.copy()
         if user_config:
             self.config.update(user_config)
+        
+        # Arrival profile CDF, normalized once (np_random.choice rebuilt and re-validated it per arrival)
+        total = self.config["prob_critical"] + self.config["prob_standard"] + self.config["prob_economy"]
+        weights = [self.config[k] / total for k in ("prob_critical", "prob_standard", "prob_economy")]
+        cdf = list(itertools.accumulate(weights))
+        self._profile_cdf = [c / cdf[-1] for c in cdf]
             
         self.num_chargers = num_chargers
         self.strategy = strategy
         self.charging_spots = num_chargers
         self.schedule = mesa.time.RandomActivation(self)
-        self.grid = mesa.space.MultiGrid(width=3, height=num_chargers + 10, torus=False)
         self.current_id = 0
         
         # Metrics
@@ -33,13 +60,24 @@ class ChargingStationModel(mesa.Model):
         
         # State
         self.current_price = self.config["price_per_kwh"]
+        self.charging_agents = []
+        self.queue_agents = []
         
-        self.agent_log = []
-        self.system_log = []
+        self.agent_log = []  # one tuple per departure, see AGENT_LOG_COLUMNS
+        self.record_agents = record_agents  # False: KPIs only, agent_log stays empty
+        self.system_log = []  # one tuple per tick, see SYSTEM_LOG_COLUMNS
+        self.logged_price_sum = 0.0  # running sum of the logged Current_Price column
+        
+        # Departure wait totals per profile (indexed by PROFILE_IDS), so batch KPIs need no log scan
+        self.wait_sum_by_profile = [0] * len(PROFILE_IDS)
+        self.wait_count_by_profile = [0] * len(PROFILE_IDS)
 
         self.running = True
 
     def step(self):
+        # charging_agents / queue_agents were bucketed at the end of the previous tick;
+        # nothing touches the agents between ticks, so pricing and queue logic reuse them
+        
         # 1. Update Market Conditions (Smart Pricing)
         self._update_smart_pricing()
         
@@ -54,8 +92,29 @@ class ChargingStationModel(mesa.Model):
             
         # 4. Advance Agents
         self.schedule.step()
+        
+        # 5. Re-bucket once for the log, the renderer and the next tick
+        self._partition_agents()
         self._log_system_state()
 
+    def run(self, n_steps=1440):
+        """
+        Advances the model n_steps ticks (default: one day) in one call.
+        Batch runs use this; the live demo keeps calling step() to render between ticks.
+        """
+        step = self.step
+        for _ in range(n_steps):
+            step()
+
+    def _partition_agents(self):
+        """
+        Single pass over the schedule instead of one list comprehension per consumer.
+        """
+        self.charging_agents, self.queue_agents = [], []
+        for a in self.schedule.agents:
+            if a.status == "Charging": self.charging_agents.append(a)
+            elif a.status == "Queuing": self.queue_agents.append(a)
+
     def _update_smart_pricing(self):
         """
         Updates the electricity price based on real-time congestion (Surge Pricing).
@@ -66,9 +125,7 @@ class ChargingStationModel(mesa.Model):
             return
 
         # Calculate Utilization (Active + Queue / Capacity)
-        active = len([a for a in self.schedule.agents if a.status == "Charging"])
-        queued = len([a for a in self.schedule.agents if a.status == "Queuing"])
-        total_load = active + queued
+        total_load = len(self.charging_agents) + len(self.queue_agents)
         
         capacity = max(self.num_chargers, 1)
         utilization_ratio = total_load / capacity
@@ -95,18 +152,16 @@ class ChargingStationModel(mesa.Model):
         multiplier = self.config.get("traffic_multiplier", 1.0)
         prob = prob * multiplier
         
-        if self.random.random() < prob:
+        # Arrivals draw only from np_random (mesa's shuffle uses self.random), and always
+        # the same number of draws whatever the queue/price state: two models with the same
+        # seed therefore see the identical arrival stream (paired FIFO vs SIRQ comparison).
+        if self.np_random.random_sample() < prob:
             # --- PROFILE SELECTION ---
-            p_crit = self.config["prob_critical"]
-            p_std = self.config["prob_standard"]
-            p_eco = self.config["prob_economy"]
-            
-            # Normalize
-            total = p_crit + p_std + p_eco
-            choices = ["CRITICAL", "STANDARD", "ECONOMY"]
-            weights = [p_crit/total, p_std/total, p_eco/total]
+            # Same draw as np_random.choice(p=...): one uniform sample searched in the CDF
+            profile = _PROFILE_CHOICES[bisect_right(self._profile_cdf, self.np_random.random_sample())]
             
-            profile = np.random.choice(choices, p=weights)
+            # Built (VOT, SoC, bid noise drawn) before the balking check to keep the stream aligned
+            agent = TruckAgent(self.current_id + 1, self, profile, self.config)
             
             # --- SMART PRICING: BALKING CHECK ---
             # If the current price is too high, the agent leaves immediately.
@@ -117,30 +172,30 @@ class ChargingStationModel(mesa.Model):
                     return # Agent does not enter system
             
             self.current_id += 1
-            agent = TruckAgent(self.current_id, self, profile, self.config)
             self.schedule.add(agent)
-            self.grid.place_agent(agent, (0, 0))
+            self.queue_agents.append(agent)
 
+    # Only the head of the queue matters each tick: heapq.nsmallest/nlargest select it in
+    # O(N log k) and are documented equal to sorted(...)[:k], ties included.
     def _logic_fifo(self):
-        queue = sorted([a for a in self.schedule.agents if a.status == "Queuing"], key=lambda x: x.unique_id)
-        while self.charging_spots > 0 and queue:
-            truck = queue.pop(0)
+        if self.charging_spots <= 0: return
+        for truck in heapq.nsmallest(self.charging_spots, self.queue_agents, key=_BY_ID):
             truck.status = "Charging"
             self.charging_spots -= 1
 
     def _logic_sirq(self):
-        queue = sorted([a for a in self.schedule.agents if a.status == "Queuing"], key=lambda x: x.bid, reverse=True)
-        chargers = [a for a in self.schedule.agents if a.status == "Charging"]
+        # Free spots go to the top bidders; the next one in line may then try to preempt
+        free = max(self.charging_spots, 0)
+        head = heapq.nlargest(free + 1, self.queue_agents, key=_BY_BID)
+        chargers = self.charging_agents
         
-        while self.charging_spots > 0 and queue:
-            truck = queue.pop(0)
+        for truck in head[:free]:
             truck.status = "Charging"
             self.charging_spots -= 1
 
-        if queue and chargers:
-            highest_bidder = queue[0]
-            chargers.sort(key=lambda x: x.bid)
-            victim = chargers[0]
+        if len(head) > free and chargers:
+            highest_bidder = head[free]
+            victim = min(chargers, key=_BY_BID)
             
             # Use Configured Preemption Premium
             premium = self.config["preemption_premium"]
@@ -155,30 +210,47 @@ class ChargingStationModel(mesa.Model):
         if reason in ["Left (Impatient)", "Preempted"] and agent.profile_type == "CRITICAL":
             self.kpi_failed_critical += 1
         
+        pid = PROFILE_IDS[agent.profile_type]
+        self.wait_sum_by_profile[pid] += agent.wait_time
+        self.wait_count_by_profile[pid] += 1
+        
+        if not self.record_agents:
+            return
+        
         # Calculate Effective Price Paid
         avg_price_paid = 0
         if agent.charged_kwh > 0:
             avg_price_paid = agent.incurred_cost / agent.charged_kwh
         
-        self.agent_log.append({
-            "ID": agent.unique_id,
-            "Profile": agent.profile_type,
-            "Urgency": round(agent.urgency, 3) if hasattr(agent, 'urgency') else 0,
-            "Value_of_Time": round(agent.value_of_time, 2),
-            "Bid": round(agent.bid, 2),
-            "Outcome": reason,
-            "Wait_Time": agent.wait_time,
-            "Strategy": self.strategy,
-            "Cost_Paid": round(agent.incurred_cost, 2), # NEW
-            "Avg_Price_kWh": round(avg_price_paid, 2)   # NEW
-        })
+        self.agent_log.append((
+            agent.unique_id,
+            agent.profile_type,
+            round(agent.urgency, 3) if hasattr(agent, 'urgency') else 0,
+            round(agent.value_of_time, 2),
+            round(agent.bid, 2),
+            reason,
+            agent.wait_time,
+            self.strategy,
+            round(agent.incurred_cost, 2),
+            round(avg_price_paid, 2)
+        ))
+
+    def agent_log_frame(self):
+        """Departure log as a DataFrame (built from tuples: no per-row dict, no key inference)."""
+        return pd.DataFrame.from_records(self.agent_log, columns=AGENT_LOG_COLUMNS)
+
+    def system_log_frame(self):
+        """Per-tick timeline as a DataFrame, built once from the logged tuples."""
+        return pd.DataFrame.from_records(self.system_log, columns=SYSTEM_LOG_COLUMNS)
 
     def _log_system_state(self):
-        self.system_log.append({
-            "Step": self.schedule.steps,
-            "Total_Revenue": round(self.kpi_revenue, 2),
-            "Queue_Length": len([a for a in self.schedule.agents if a.status == "Queuing"]),
-            "Strategy": self.strategy,
-            "Current_Price": round(self.current_price, 2), # Log Dynamic Price
-            "Balked_Agents": self.kpi_balked_agents
-        })
\ No newline at end of file
+        price = round(self.current_price, 2) # Log Dynamic Price
+        self.logged_price_sum += price
+        self.system_log.append((
+            self.schedule.steps,
+            round(self.kpi_revenue, 2),
+            len(self.queue_agents),
+            self.strategy,
+            price,
+            self.kpi_balked_agents
+        ))
\ No newline at end of file
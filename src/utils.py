@@ -1,7 +1,96 @@
 import pandas as pd
 import json
 import io
+import time
 import zipfile
+from src.config import TRUCK_PROFILES
+
+# Label columns get the same categorical dtypes a fresh batch produces (None: infer)
+_CATEGORIES = {"Strategy": ["FIFO", "SIRQ"], "Profile": list(TRUCK_PROFILES), "Outcome": None}
+
+def _as_categories(df):
+    """
+    Imported frames (CSV in particular) come back with object-dtype labels; convert them
+    so Deep Dive groupbys and filters run on category codes, as for a fresh batch.
+    """
+    if df is None:
+        return None
+    for col, cats in _CATEGORIES.items():
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = pd.Categorical(df[col], categories=cats)
+    return df
+
+def _write_csv(zf, name, df):
+    """
+    Streams a DataFrame as CSV straight into a ZIP entry (no full in-memory string).
+    """
+    with zf.open(name, "w") as raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as fh:
+        df.to_csv(fh, index=False)
+
+def _write_parquet(zf, name, df):
+    """
+    Columnar binary entry: dictionary-encoded strings, no float-to-text formatting.
+    Stored, not deflated: the pages are already zstd-compressed.
+    """
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    with zf.open(info, "w") as fh:
+        df.to_parquet(fh, engine="pyarrow", compression="zstd", index=False)
+
+def create_results_zip(summary_df, micro_df=None, fmt="parquet"):
+    """
+    Bundles the Monte Carlo summary (and optional agent micro-log) for the Data Manager.
+    fmt: "parquet" (default, smaller/faster) or "csv" (fallback for spreadsheet users).
+    """
+    buffer = io.BytesIO()
+    write = _write_parquet if fmt == "parquet" else _write_csv
+    
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        write(zf, f"summary.{fmt}", summary_df)
+        if micro_df is not None:
+            write(zf, f"micro.{fmt}", micro_df)
+        # Frame attrs (the batch's master seed) don't survive CSV, so they ride alongside
+        if summary_df.attrs:
+            zf.writestr("meta.json", json.dumps(summary_df.attrs))
+    
+    return buffer.getvalue()
+
+def load_results_zip(uploaded_file):
+    """
+    Reads a Data Manager ZIP back. Parquet entries win; CSV keeps older exports loadable.
+    meta.json, when present, restores the summary's attrs (e.g. master_seed).
+    """
+    with zipfile.ZipFile(uploaded_file, "r") as zf:
+        names = set(zf.namelist())
+        
+        def read(stem):
+            if f"{stem}.parquet" in names:
+                return pd.read_parquet(io.BytesIO(zf.read(f"{stem}.parquet")))
+            if f"{stem}.csv" in names:
+                return pd.read_csv(io.BytesIO(zf.read(f"{stem}.csv")))
+            return None
+        
+        summary_df = read("summary")
+        if summary_df is None:
+            raise KeyError("archive contains neither summary.parquet nor summary.csv")
+        micro_df = read("micro")
+        if "meta.json" in names:
+            summary_df.attrs.update(json.loads(zf.read("meta.json").decode("utf-8")))
+    
+    return _as_categories(summary_df), _as_categories(micro_df)
+
+def load_results_file(uploaded_file, name=None):
+    """
+    Data Manager import: routes on the file extension, so a bare summary.parquet /
+    summary.csv (e.g. written by a notebook) loads without being zipped first.
+    name overrides uploaded_file.name (for plain byte buffers).
+    """
+    name = (name or uploaded_file.name).lower()
+    if name.endswith(".parquet"):
+        return _as_categories(pd.read_parquet(uploaded_file)), None
+    if name.endswith(".csv"):
+        return _as_categories(pd.read_csv(uploaded_file)), None
+    return load_results_zip(uploaded_file)
 
 def create_experiment_zip(config, agent_df, system_df):
     """
@@ -14,8 +103,8 @@ def create_experiment_zip(config, agent_df, system_df):
         zf.writestr("config.json", json.dumps(config, indent=4))
         
         # 2. Save DataFrames
-        zf.writestr("agents.csv", agent_df.to_csv(index=False))
-        zf.writestr("timeline.csv", system_df.to_csv(index=False))
+        _write_csv(zf, "agents.csv", agent_df)
+        _write_csv(zf, "timeline.csv", system_df)
         
     buffer.seek(0)
     return buffer
@@ -29,7 +118,7 @@ def load_experiment_zip(uploaded_file):
         config = json.loads(zf.read("config.json").decode("utf-8"))
         
         # 2. Load DataFrames
-        agents_df = pd.read_csv(io.BytesIO(zf.read("agents.csv")))
+        agents_df = _as_categories(pd.read_csv(io.BytesIO(zf.read("agents.csv"))))
         timeline_df = pd.read_csv(io.BytesIO(zf.read("timeline.csv")))
         
     return config, agents_df, timeline_df
\ No newline at end of file
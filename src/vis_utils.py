@@ -1,60 +1,134 @@
+import heapq
+import json
 import textwrap
+from functools import lru_cache
+from operator import attrgetter
+
+_BY_ID = attrgetter("unique_id")
+_BY_BID = attrgetter("bid")
+
+def _visible(truck):
+    """(color, border, bid) - everything the twin shows about one truck."""
+    # Safety checks for attributes
+    return (getattr(truck, "color", "#3498db"), getattr(truck, "border", "1px solid #2980b9"), int(getattr(truck, "bid", 0)))
 
 def render_station_visual(model):
     """
     Generates the HTML Digital Twin for the Business Demo.
+    Frames whose visible state did not change are served from a memo.
     """
-    chargers = [a for a in model.schedule.agents if a.status == "Charging"]
-    queue = [a for a in model.schedule.agents if a.status == "Queuing"]
-    
+    # Status buckets maintained by the model at the end of every tick
+    chargers = model.charging_agents
+    queue = model.queue_agents
+    # Only the 8 visible slots are ordered (same result as sorted(...)[:8], ties included)
     if model.strategy == "FIFO":
-        queue.sort(key=lambda x: x.unique_id)
+        head = heapq.nsmallest(8, queue, key=_BY_ID)
     else:
-        queue.sort(key=lambda x: x.bid, reverse=True)
-
-    charger_html = ""
-    for i in range(model.num_chargers):
-        if i < len(chargers):
-            truck = chargers[i]
-            # Safety checks for attributes
-            color = getattr(truck, "color", "#3498db")
-            border = getattr(truck, "border", "1px solid #2980b9")
-            bid = getattr(truck, "bid", 0)
-            
-            charger_html += f"""
-            <div style="background-color: {color}; color: white; padding: 6px; border-radius: 6px; 
-                        width: 80px; text-align: center; border: {border}; margin: 2px; box-shadow: 1px 1px 3px rgba(0,0,0,0.2);">
-                <div style="font-size: 14px; font-weight: bold;">⚡ {i+1}</div>
-                <div style="font-size: 10px; opacity: 0.9;">${int(bid)}</div>
-            </div>"""
-        else:
-            charger_html += f"""
-            <div style="background-color: #f0f2f6; color: #bcccdb; padding: 6px; border-radius: 6px; 
-                        width: 80px; text-align: center; border: 2px dashed #dbe4eb; margin: 2px;">
-                <div style="font-size: 14px;">💤 {i+1}</div>
-            </div>"""
-
-    queue_html = ""
-    if not queue:
-        queue_html = "<div style='color: #aaa; font-style: italic; font-size: 11px; padding: 5px;'>Queue Empty</div>"
-    else:
-        for truck in queue[:8]:
-            color = getattr(truck, "color", "#3498db")
-            border = getattr(truck, "border", "1px solid #2980b9")
-            bid = getattr(truck, "bid", 0)
-            queue_html += f"""
-            <div style="background-color: {color}; color: white; padding: 3px 6px; border-radius: 4px; 
-                        font-size: 10px; text-align: center; margin: 2px; min-width: 35px; border: {border};">
-                <b>${int(bid)}</b>
-            </div>"""
-        if len(queue) > 8: 
-            queue_html += f"<div style='color: #888; font-size: 9px;'>+{len(queue)-8}</div>"
+        head = heapq.nlargest(8, queue, key=_BY_BID)
 
-    return f"""
+    return _render_from_state(
+        model.num_chargers,
+        tuple(_visible(t) for t in chargers[:model.num_chargers]),
+        tuple(_visible(t) for t in head),
+        len(queue)
+    )
+
+def _compact(html):
+    return html.replace("\n", "").strip()
+
+# Format strings built once at import; a frame is a handful of .format() calls + joins
+_CHARGER_BUSY = _compact("""
+    <div style="background-color: {0}; color: white; padding: 6px; border-radius: 6px; 
+                width: 80px; text-align: center; border: {1}; margin: 2px; box-shadow: 1px 1px 3px rgba(0,0,0,0.2);">
+        <div style="font-size: 14px; font-weight: bold;">⚡ {3}</div>
+        <div style="font-size: 10px; opacity: 0.9;">${2}</div>
+    </div>""")
+_CHARGER_IDLE = _compact("""
+    <div style="background-color: #f0f2f6; color: #bcccdb; padding: 6px; border-radius: 6px; 
+                width: 80px; text-align: center; border: 2px dashed #dbe4eb; margin: 2px;">
+        <div style="font-size: 14px;">💤 {0}</div>
+    </div>""")
+_QUEUE_ITEM = _compact("""
+    <div style="background-color: {0}; color: white; padding: 3px 6px; border-radius: 4px; 
+                font-size: 10px; text-align: center; margin: 2px; min-width: 35px; border: {1};">
+        <b>${2}</b>
+    </div>""")
+_QUEUE_EMPTY = "<div style='color: #aaa; font-style: italic; font-size: 11px; padding: 5px;'>Queue Empty</div>"
+_QUEUE_MORE = "<div style='color: #888; font-size: 9px;'>+{0}</div>"
+_STATION = _compact("""
     <div style="font-family: sans-serif;">
-        <div style="display: flex; flex-wrap: wrap; justify-content: center; margin-bottom: 5px;">{charger_html}</div>
+        <div style="display: flex; flex-wrap: wrap; justify-content: center; margin-bottom: 5px;">{0}</div>
         <div style="background-color: #f8f9fa; padding: 5px; border-radius: 6px; border-top: 3px solid #ddd; display: flex; flex-wrap: wrap; justify-content: center;">
-            {queue_html}
+            {1}
         </div>
+    </div>""")
+
+@lru_cache(maxsize=1024)
+def _render_from_state(num_chargers, chargers, queue, queue_len):
+    charger_html = "".join(
+        [_CHARGER_BUSY.format(*t, i + 1) for i, t in enumerate(chargers)] +
+        [_CHARGER_IDLE.format(i + 1) for i in range(len(chargers), num_chargers)]
+    )
+
+    if not queue:
+        queue_html = _QUEUE_EMPTY
+    else:
+        queue_html = "".join([_QUEUE_ITEM.format(*t) for t in queue])
+        if queue_len > 8:
+            queue_html += _QUEUE_MORE.format(queue_len - 8)
+
+    return _STATION.format(charger_html, queue_html)
+
+def render_kpi_panel(model, background):
+    """
+    Live KPI box shown under each twin, rendered in the same markdown call as the station.
+    """
+    return f"""
+    <div style="background-color: {background}; padding: 10px 14px; border-radius: 6px; margin-top: 8px; font-size: 14px; line-height: 1.6;">
+        <b>Rev:</b> ${int(model.kpi_revenue)} | <b>Failures:</b> {model.kpi_failed_critical}<br>
+        <b>Price:</b> ${model.current_price:.2f}/kWh | <b>Lost:</b> {model.kpi_balked_agents}
+    </div>
+    """.replace("\n", "").strip()
+
+_PLAYER_TEMPLATE = """
+<div style="font-family: 'Source Sans Pro', sans-serif; color: #31333f;">
+    <div style="display: flex; gap: 16px;">
+        <div style="flex: 1;"><h3 style="margin: 0 0 8px 0;">Baseline (FIFO)</h3><div id="fifo"></div></div>
+        <div style="flex: 1;"><h3 style="margin: 0 0 8px 0;">SIRQ (Auction)</h3><div id="sirq"></div></div>
+    </div>
+    <div style="background-color: #f0f2f6; height: 6px; border-radius: 3px; margin-top: 12px;">
+        <div id="bar" style="background-color: #ff4b4b; height: 6px; width: 0; border-radius: 3px;"></div>
     </div>
-    """.replace("\n", "").strip()
\ No newline at end of file
+</div>
+<script>
+    const H = __HTML__, F = __FRAMES__;
+    const fifo = document.getElementById("fifo"), sirq = document.getElementById("sirq"), bar = document.getElementById("bar");
+    let i = 0, lastF = -1, lastS = -1;
+    const show = () => {
+        const [tick, f, s] = F[i];
+        if (f !== lastF) { fifo.innerHTML = H[f]; lastF = f; }
+        if (s !== lastS) { sirq.innerHTML = H[s]; lastS = s; }
+        bar.style.width = (100 * tick / 1440) + "%";
+        if (++i >= F.length) clearInterval(timer);
+    };
+    const timer = setInterval(show, __INTERVAL__);
+</script>
+"""
+
+def render_demo_player(frames, interval_ms):
+    """
+    Self-contained page that animates precomputed (tick, fifo_html, sirq_html) frames
+    in the browser: the demo ships as one payload instead of one update per frame.
+    Each distinct panel is sent once and frames index into it; the DOM is only
+    touched when a panel actually changes between frames.
+    """
+    ids = {}
+    def intern(html):
+        return ids.setdefault(html, len(ids))
+    index = [(tick, intern(f), intern(s)) for tick, f, s in frames]
+    
+    html = json.dumps(list(ids)).replace("</", "<\\/")
+    return (_PLAYER_TEMPLATE
+            .replace("__HTML__", html)
+            .replace("__FRAMES__", json.dumps(index))
+            .replace("__INTERVAL__", str(int(interval_ms))))